@@ -11,21 +11,92 @@ Mudanças nesta versão (v18.5.2):
 - Mantém: Aba 3 com **re-render local** via `st.empty()` (cliques rápidos), **símbolos de mana** no badge, e Aba 4 com
   **análise preguiçosa** (toggle para calcular sob demanda), além do **fix do Altair** nos donuts.
 """
+import heapq
+import itertools
+import os
 import re
+import threading
 import time
 import urllib.parse
-from collections import deque, defaultdict
-from concurrent.futures import ThreadPoolExecutor
+import uuid
+from collections import OrderedDict, deque, defaultdict
+from concurrent.futures import Future
+from contextlib import contextmanager
 
 import requests
 import streamlit as st
 import pandas as pd
 import altair as alt
 
+# =========================================================
+# Perfil por rerun — fases cronometradas + captura opcional (flamegraph)
+# =========================================================
+PERF_HISTORY = 50           # reruns guardados no histórico da sessão
+PERF_DIR = "profiles"       # onde as capturas speedscope são gravadas
+PERF_MAX_FILES = 20         # capturas mantidas em PERF_DIR; as mais antigas são apagadas
+_perf_t0 = time.perf_counter()
+_perf_spans = {}            # nome -> [segundos, chamadas, profundidade]
+_perf_stack = []            # fases abertas (a última é a corrente)
+
+@contextmanager
+def fase(nome: str):
+    """Cronometra um trecho do rerun; chamadas repetidas com o mesmo nome são somadas."""
+    span = _perf_spans.setdefault(nome, [0.0, 0, len(_perf_stack)])
+    _perf_stack.append(nome)
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        _perf_stack.pop()
+        span[0] += time.perf_counter() - t
+        span[1] += 1
+
+def fase_workers(fn):
+    """Embrulha `fn` para somar o tempo gasto nos workers do pool numa sub-fase da fase corrente.
+
+    A thread do script só vê a espera em `Future.result`; isto mostra quanto cada tarefa custou de fato.
+    """
+    nome = f"{_perf_stack[-1] if _perf_stack else 'Fora de fase'} · nos workers (soma)"
+    span = _perf_spans.setdefault(nome, [0.0, 0, len(_perf_stack)])
+    lock = threading.Lock()
+
+    def timed(*args):
+        t = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with lock:
+                span[0] += time.perf_counter() - t
+                span[1] += 1
+    return timed
+
+def css(bloco: str):
+    with fase("CSS"):
+        st.markdown(bloco, unsafe_allow_html=True)
+
+# Captura por amostragem (pyinstrument é opcional): armada no rerun anterior pelo botão da sidebar
+_profiler = None
+_stale, _stale_thread = st.session_state.pop("perf_profiler", (None, None))
+if _stale is not None and _stale.is_running and _stale_thread == threading.get_ident():
+    # rerun anterior interrompido (st.rerun/st.stop) na mesma thread; com fastReruns a thread é outra e
+    # o amostrador morre com ela — pyinstrument só para o profiler na thread que o iniciou
+    try:
+        _stale.stop()
+    except RuntimeError:
+        pass
+if st.session_state.pop("perf_capture", False):
+    try:
+        from pyinstrument import Profiler
+        _profiler = Profiler(interval=0.001)
+        _profiler.start()
+        st.session_state.perf_profiler = (_profiler, threading.get_ident())
+    except ImportError:
+        st.session_state.perf_capture_msg = "Instale `pyinstrument` para capturar flamegraphs."
+
 # =========================================================
 # CSS da aba 1 — Botões centralizados + Cartas tamanho fixo
 # =========================================================
-st.markdown("""
+css("""
     <style>
         /* Botões centralizados na mesma linha */
         .aba1-btn-row {
@@ -51,7 +122,7 @@ st.markdown("""
             object-fit: cover;  /* recorta mantendo proporção */
         }
     </style>
-""", unsafe_allow_html=True)
+""")
 
 
 
@@ -60,7 +131,7 @@ st.markdown("""
 # =========================================================
 # CSS da aba 3 — centralização dos botões no Deckbuilder
 # =========================================================
-st.markdown("""
+css("""
     <style>
         .rf-btn-row {
             display: flex;
@@ -75,22 +146,110 @@ st.markdown("""
             height: 32px;
         }
     </style>
-""", unsafe_allow_html=True)
+""")
 
 # ===== Sessão HTTP + throttle =====
+# Base da API; `loadtest.py` aponta para um Scryfall falso local via SCRYFALL_API
+SCRYFALL_API = os.environ.get("SCRYFALL_API", "https://api.scryfall.com").rstrip("/")
 SESSION = requests.Session()
 SESSION.headers.update({
     "User-Agent": "RomanticFormatTools/2.2 (+seu_email_ou_site)",
     "Accept": "application/json;q=0.9,*/*;q=0.8",
 })
-_last = deque(maxlen=10)
+RATE_LIMIT = 10      # req/s para a API
+THROTTLE_SLACK = 1.1  # folga no espaçamento (~9 req/s) para o jitter de rede não estourar o orçamento
+
+@st.cache_resource
+def _throttle_state():
+    # Compartilhado entre reruns e sessões: o orçamento de 10 req/s é do processo, não do rerun
+    return {"proximo": 0.0}, threading.Lock()
 
 def throttle():
-    _last.append(time.time())
-    if len(_last) == _last.maxlen:
-        elapsed = _last[-1] - _last[0]
-        if elapsed < 1.0:
-            time.sleep(1.0 - elapsed)
+    # Reserva o próximo horário livre (1 requisição a cada ~110 ms) e dorme fora do lock
+    slot, lock = _throttle_state()
+    with lock:
+        agora = time.monotonic()
+        espera = slot["proximo"] - agora
+        slot["proximo"] = max(agora, slot["proximo"]) + THROTTLE_SLACK / RATE_LIMIT
+    if espera > 0:
+        time.sleep(espera)
+
+# ===== Pool de workers compartilhado =====
+PRIO_INTERATIVA, PRIO_ANALISE, PRIO_PREFETCH = 0, 1, 2
+POOL_WORKERS = 8
+POOL_MAX_SESSIONS = 1000  # gerações lembradas (LRU); sessões mais antigas não têm o que cancelar
+
+class PoolPrioritario:
+    """Pool único do processo: fila por prioridade, vez justa entre sessões e descarte de reruns superados.
+
+    A chave da fila é (prioridade, vez, seq). A `vez` de cada sessão avança a cada tarefa enfileirada e
+    nunca fica atrás da última vez despachada, então sessões intercalam em vez de uma esvaziar a fila.
+    """
+
+    def __init__(self, workers: int):
+        self._heap = []
+        self._cv = threading.Condition()
+        self._seq = itertools.count()
+        self._vez = {}                     # (prio, sessão) -> última vez atribuída; só sessões com fila
+        self._vez_atual = defaultdict(int)  # prio -> vez da última tarefa despachada
+        self._pendentes = {}               # sessão -> tarefas na fila
+        self._geracao = OrderedDict()      # sessão -> rerun corrente (LRU limitada a POOL_MAX_SESSIONS)
+        self._contador_ger = itertools.count(1)  # global: despejar uma sessão da LRU não reinicia a contagem
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"rf-pool-{i}", daemon=True).start()
+
+    def nova_geracao(self, sessao: str) -> int:
+        """Marca o início de um rerun e cancela o que o rerun anterior da sessão deixou na fila."""
+        with self._cv:
+            ger = next(self._contador_ger)
+            self._geracao[sessao] = ger
+            self._geracao.move_to_end(sessao)
+            while len(self._geracao) > POOL_MAX_SESSIONS:
+                self._geracao.popitem(last=False)
+            for *_, (s, g, fut, _fn, _args) in self._heap:
+                if s == sessao and g < ger:
+                    fut.cancel()
+            return ger
+
+    def submit(self, fn, *args, prio: int, sessao: str, geracao: int) -> Future:
+        fut = Future()
+        with self._cv:
+            vez = max(self._vez.get((prio, sessao), 0), self._vez_atual[prio]) + 1
+            self._vez[(prio, sessao)] = vez
+            self._pendentes[sessao] = self._pendentes.get(sessao, 0) + 1
+            heapq.heappush(self._heap, (prio, vez, next(self._seq), (sessao, geracao, fut, fn, args)))
+            self._cv.notify()
+        return fut
+
+    def map(self, fn, items, prio: int, sessao: str, geracao: int) -> list:
+        futs = [self.submit(fn, it, prio=prio, sessao=sessao, geracao=geracao) for it in items]
+        return [f.result() for f in futs]
+
+    def _worker(self):
+        while True:
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+                prio, vez, _, (sessao, ger, fut, fn, args) = heapq.heappop(self._heap)
+                self._vez_atual[prio] = max(self._vez_atual[prio], vez)
+                self._pendentes[sessao] -= 1
+                if not self._pendentes[sessao]:
+                    # fila da sessão vazia: a próxima tarefa parte de _vez_atual, então a vez guardada é inútil
+                    del self._pendentes[sessao]
+                    for p in (PRIO_INTERATIVA, PRIO_ANALISE, PRIO_PREFETCH):
+                        self._vez.pop((p, sessao), None)
+                if ger < self._geracao.get(sessao, 0):
+                    fut.cancel()
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+
+@st.cache_resource
+def pool_compartilhado() -> PoolPrioritario:
+    return PoolPrioritario(POOL_WORKERS)
 
 # ===== Config & listas =====
 allowed_sets = {
@@ -98,6 +257,9 @@ allowed_sets = {
     "10E","LRW","MOR","SHM","EVE","ALA","CON","ARB","M10","ZEN","WWK","ROE","M11","SOM","MBS","NPH",
     "M12","ISD","DKA","AVR","M13",
 }
+# Aba 3 — grade paginada
+TAB3_PAGE_SIZES = [12, 24, 48]
+TAB3_MAX_TILES = 48  # teto de cartas (e dos widgets delas) renderizadas por rerun
 ban_list = {
     "Gitaxian Probe",
     "Mental Misstep",
@@ -135,13 +297,21 @@ ban_list = {
 if 'deck' not in st.session_state: st.session_state.deck = {}
 if 'last_change' not in st.session_state: st.session_state.last_change = None
 if 'last_action' not in st.session_state: st.session_state.last_action = None
+if 'pool_sessao' not in st.session_state: st.session_state.pool_sessao = uuid.uuid4().hex
+
+POOL = pool_compartilhado()
+SESSAO = st.session_state.pool_sessao
+GERACAO = POOL.nova_geracao(SESSAO)
+
+def pool_map(fn, items, prio=PRIO_INTERATIVA):
+    return POOL.map(fase_workers(fn), items, prio=prio, sessao=SESSAO, geracao=GERACAO)
 
 # ===== Utilidades =====
 def buscar_sugestoes(query: str):
     q = query.strip()
     if len(q) < 2:
         return []
-    url = f"https://api.scryfall.com/cards/autocomplete?q={urllib.parse.quote(q)}"
+    url = f"{SCRYFALL_API}/cards/autocomplete?q={urllib.parse.quote(q)}"
     try:
         throttle(); r = SESSION.get(url, timeout=8)
         if r.ok:
@@ -151,9 +321,64 @@ def buscar_sugestoes(query: str):
     return []
 
 @st.cache_data(show_spinner=False)
-def fetch_card_data(card_name, _salt=','.join(sorted(allowed_sets))):
+def _fetch_ban_image(card_name):
+    # Falha transitória (timeout, 429, 5xx) levanta exceção: st.cache_data não guarda e o próximo rerun tenta
+    url = f"{SCRYFALL_API}/cards/named?fuzzy={urllib.parse.quote(card_name.strip())}"
+    throttle(); resp = SESSION.get(url, timeout=8)
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+    return pick_image(resp.json())
+
+def fetch_ban_image(card_name):
+    try:
+        img = _fetch_ban_image(card_name)
+    except Exception:
+        return None
+    if img is None:
+        # resposta definitiva sem imagem fica em cache; a atualização incremental a libera para nova tentativa
+        reg, lock = _card_registry()
+        with lock:
+            reg["ban_misses"].add(card_name)
+    return img
+
+def pick_image(card: dict):
+    img = (card.get("image_uris", {}) or {}).get("normal") or (card.get("image_uris", {}) or {}).get("small")
+    if img:
+        return img
+    faces = card.get("card_faces") or []
+    for face in faces:
+        img2 = (face.get("image_uris", {}) or {}).get("normal") or (face.get("image_uris", {}) or {}).get("small")
+        if img2:
+            return img2
+    return None
+
+def card_record(data: dict, sets: set) -> dict:
+    return {
+        "id": data.get("id"),
+        "name": data.get("name", ""),
+        "sets": sets,
+        "image": pick_image(data),
+        "type": data.get("type_line", ""),
+        "cmc": data.get("cmc"),
+        "mana_cost": data.get("mana_cost"),
+        "colors": data.get("colors"),
+        "color_identity": data.get("color_identity"),
+        "produced_mana": data.get("produced_mana"),
+    }
+
+def card_fingerprint(rec: dict) -> tuple:
+    # Campos exibidos pelo app (sem `sets`, que vem de prints antigos e não muda)
+    return tuple(
+        tuple(v) if isinstance(v, list) else v
+        for k, v in sorted(rec.items()) if k not in ("id", "sets")
+    )
+
+@st.cache_data(show_spinner=False)
+def _fetch_card_data(card_name, _salt=','.join(sorted(allowed_sets))):
+    # Acesse via fetch_card_data(): ele registra a carta para a atualização incremental
     safe_name = card_name.strip()
-    url_named = f"https://api.scryfall.com/cards/named?fuzzy={urllib.parse.quote(safe_name)}"
+    url_named = f"{SCRYFALL_API}/cards/named?fuzzy={urllib.parse.quote(safe_name)}"
     try:
         throttle(); resp = SESSION.get(url_named, timeout=8)
     except Exception:
@@ -164,24 +389,11 @@ def fetch_card_data(card_name, _salt=','.join(sorted(allowed_sets))):
     if "prints_search_uri" not in data:
         return None
 
-    def pick_image(card: dict):
-        img = (card.get("image_uris", {}) or {}).get("normal") or (card.get("image_uris", {}) or {}).get("small")
-        if img:
-            return img
-        faces = card.get("card_faces") or []
-        for face in faces:
-            img2 = (face.get("image_uris", {}) or {}).get("normal") or (face.get("image_uris", {}) or {}).get("small")
-            if img2:
-                return img2
-        return None
-
-    base_img = pick_image(data)
-
     # ==== 1) quick scan (exato pelo nome dentro dos sets permitidos)
     all_sets = set()
     set_query = " OR ".join(s.lower() for s in allowed_sets)
     q_str = f'!"{safe_name}" e:({set_query})'
-    quick_url = "https://api.scryfall.com/cards/search?q=" + urllib.parse.quote_plus(q_str)
+    quick_url = f"{SCRYFALL_API}/cards/search?q=" + urllib.parse.quote_plus(q_str)
     try:
         throttle(); rq = SESSION.get(quick_url, timeout=8)
         if rq.status_code == 200 and rq.json().get("total_cards", 0) > 0:
@@ -191,17 +403,7 @@ def fetch_card_data(card_name, _salt=','.join(sorted(allowed_sets))):
                 sc = (c.get("set") or "").upper()
                 if sc:
                     all_sets.add(sc)
-            return {
-                "name": data.get("name", ""),
-                "sets": all_sets,
-                "image": base_img,
-                "type": data.get("type_line", ""),
-                "cmc": data.get("cmc"),
-                "mana_cost": data.get("mana_cost"),
-                "colors": data.get("colors"),
-                "color_identity": data.get("color_identity"),
-                "produced_mana": data.get("produced_mana"),
-            }
+            return card_record(data, all_sets)
     except Exception:
         pass
 
@@ -223,17 +425,111 @@ def fetch_card_data(card_name, _salt=','.join(sorted(allowed_sets))):
     except Exception:
         pass
 
-    return {
-        "name": data.get("name", ""),
-        "sets": all_sets,
-        "image": base_img,
-        "type": data.get("type_line", ""),
-        "cmc": data.get("cmc"),
-        "mana_cost": data.get("mana_cost"),
-        "colors": data.get("colors"),
-        "color_identity": data.get("color_identity"),
-        "produced_mana": data.get("produced_mana"),
-    }
+    return card_record(data, all_sets)
+
+# ===== Cache de cartas — registro + atualização incremental =====
+COLLECTION_BATCH = 75  # limite de identificadores por POST /cards/collection
+
+@st.cache_resource
+def _card_registry():
+    # nome consultado -> {"id", "fp"}; "marker" = `updated_at` do bulk-data na última verificação;
+    # "ban_misses" = cartas da banlist cuja imagem veio vazia
+    return {"cards": {}, "marker": None, "ban_misses": set()}, threading.Lock()
+
+def fetch_card_data(card_name):
+    d = _fetch_card_data(card_name)
+    reg, lock = _card_registry()
+    entry = {"id": d.get("id") if d else None, "fp": card_fingerprint(d) if d else None}
+    # Caminho quente (cache hit a cada rerun): leitura sem lock; só escreve quando a entrada é nova ou mudou
+    if reg["cards"].get(card_name) != entry:
+        with lock:
+            reg["cards"][card_name] = entry
+    return d
+
+def _forget_cards(names):
+    # Remove só estas entradas do st.cache_data (e do registro); a próxima consulta busca de novo
+    reg, lock = _card_registry()
+    with lock:
+        for nm in names:
+            reg["cards"].pop(nm, None)
+    for nm in names:
+        _fetch_card_data.clear(nm)
+
+def clear_card_cache():
+    reg, lock = _card_registry()
+    with lock:
+        reg["cards"].clear(); reg["marker"] = None; reg["ban_misses"].clear()
+    _fetch_card_data.clear(); _fetch_ban_image.clear()
+
+def upstream_marker():
+    try:
+        throttle(); r = SESSION.get(f"{SCRYFALL_API}/bulk-data/oracle-cards", timeout=8)
+        if r.status_code == 200:
+            return r.json().get("updated_at")
+    except Exception:
+        pass
+    return None
+
+def refresh_card_cache() -> dict:
+    """Revalida só o que mudou no upstream.
+
+    Se o `updated_at` do bulk-data não mudou desde a última verificação, nada mais é consultado
+    (`unchanged`). Caso contrário as cartas em cache são comparadas em lotes via /cards/collection e só as
+    alteradas (`changed`) saem do cache — as demais continuam quentes. Nomes que nunca resolveram (erros de
+    digitação, falhas de API) e imagens da banlist que vieram vazias são liberados para nova tentativa e
+    contados à parte em `retried`.
+    """
+    reg, lock = _card_registry()
+    with lock:
+        ban_misses, reg["ban_misses"] = reg["ban_misses"], set()
+    for nm in ban_misses:
+        _fetch_ban_image.clear(nm)  # imagens da banlist que vieram vazias: sempre tentadas de novo
+
+    marker = upstream_marker()
+    result = {"marker": marker, "unchanged": False, "ok": True, "checked": 0, "changed": 0,
+              "retried": len(ban_misses)}
+    with lock:
+        if marker and marker == reg["marker"]:
+            result["unchanged"] = True
+            return result
+        snapshot = {nm: dict(info) for nm, info in reg["cards"].items()}
+
+    retry = [nm for nm, info in snapshot.items() if not info.get("id")]
+    by_id = defaultdict(list)
+    for nm, info in snapshot.items():
+        if info.get("id"):
+            by_id[info["id"]].append(nm)
+    ids = list(by_id)
+    changed = set()
+    for i in range(0, len(ids), COLLECTION_BATCH):
+        batch = ids[i:i + COLLECTION_BATCH]
+        try:
+            throttle()
+            r = SESSION.post(f"{SCRYFALL_API}/cards/collection",
+                             json={"identifiers": [{"id": cid} for cid in batch]}, timeout=15)
+            j = r.json() if r.status_code == 200 else None
+        except Exception:
+            j = None
+        if j is None:
+            result["ok"] = False  # não grava o marcador: a próxima tentativa recomeça
+            break
+        result["checked"] += sum(len(by_id[cid]) for cid in batch)
+        found = set()
+        for c in j.get("data", []):
+            found.add(c.get("id"))
+            fp = card_fingerprint(card_record(c, set()))
+            changed.update(nm for nm in by_id.get(c.get("id"), []) if snapshot[nm].get("fp") != fp)
+        for cid in batch:
+            if cid not in found:
+                changed.update(by_id[cid])
+
+    _forget_cards(changed | set(retry))
+    result["changed"] = len(changed)
+    result["retried"] += len(retry)
+    if result["ok"] and marker:
+        with lock:
+            reg["marker"] = marker
+    return result
 
 # ===== Legalidade =====
 def check_legality(name, sets):
@@ -261,10 +557,28 @@ def remove_card(card_name, qty=1):
 st.set_page_config(page_title="Romantic Format Tools", page_icon="🧙", layout="centered")
 with st.sidebar:
     st.markdown("### ⚙️ Utilitários")
+    if st.button("♻️ Atualizar só o que mudou"):
+        with st.spinner("Verificando mudanças no Scryfall..."):
+            res = refresh_card_cache()
+        retried = f" Sem resultado antes, tentadas de novo: {res['retried']}." if res["retried"] else ""
+        if res["unchanged"]:
+            st.success(f"Nada mudou no upstream desde a última verificação ({res['marker']}).{retried}")
+        elif not res["ok"]:
+            st.warning(f"Falha ao consultar o Scryfall ({res['checked']} cartas verificadas, "
+                       f"{res['changed']} alteradas). Tente de novo.{retried}")
+        else:
+            st.success(f"{res['checked']} cartas verificadas, {res['changed']} alteradas e recarregadas "
+                       f"sob demanda.{retried}")
     if st.button("🔄 Limpar cache de cartas"):
-        fetch_card_data.clear(); st.rerun()
+        clear_card_cache(); st.rerun()
+
+    st.markdown("### ⏱️ Perfil do rerun")
+    perf_ph = st.empty()  # preenchido no fim do script, quando todas as fases já rodaram
+    if st.button("🔥 Capturar próximo rerun (flamegraph)"):
+        st.session_state.perf_capture = True; st.rerun()
+    perf_files_ph = st.empty()
 
-st.markdown(
+css(
     """
     <style>
     :root{
@@ -275,7 +589,7 @@ st.markdown(
       --rf-overlimit: #ef4444;
     }
     .rf-card{ position:relative; border-radius:12px; overflow:hidden; box-shadow:0 2px 10px rgba(0,0,0,.12); background:#0b0b0b08; }
-    .rf-card img.rf-img{ display:block; width:100%; height:auto; }
+    .rf-card img.rf-img{ display:block; width:100%; height:auto; aspect-ratio:488/680; background:linear-gradient(135deg,#1e293b,#334155); }
     .rf-fixed1{ max-width: var(--rf-card1-max); margin:0 auto; }
     .rf-fixed3{ max-width: var(--rf-card3-max); margin:0 auto; }
     .rf-name-badge{
@@ -299,8 +613,7 @@ st.markdown(
     @media (max-width:1100px){ [data-testid="column"]{ padding-left:.25rem; padding-right:.25rem } }
     @media (max-width:820px){ [data-testid="column"]{ padding-left:.20rem; padding-right:.20rem } }
     </style>
-    """,
-    unsafe_allow_html=True,
+    """
 )
 
 st.title("🧙 Romantic Format Tools")
@@ -315,7 +628,7 @@ def html_card(img_url: str, overlay_html: str, qty: int, extra_cls: str = "", ov
     qty_cls = "rf-qty-badge rf-over" if overlimit else "rf-qty-badge"
     return f"""
     <div class='{cls}'>
-      <img src='{img_src}' class='rf-img'/>
+      <img src='{img_src}' class='rf-img' loading='lazy' decoding='async' width='488' height='680'/>
       {overlay_html}
       <div class='{qty_cls}'>x{qty}</div>
     </div>
@@ -325,18 +638,19 @@ def html_card(img_url: str, overlay_html: str, qty: int, extra_cls: str = "", ov
 # =====================================================================
 # TAB 1 — Sugestões
 # =====================================================================
-with tab1:
+with tab1, fase("Aba 1"):
     import html as _html
     st.caption("Digite o começo do nome da carta e use +/− para ajustar no seu deck.")
     query = st.text_input("Buscar carta:")
     COLS_TAB1 = 3
     thumbs = []
     if query.strip():
-        for nm in buscar_sugestoes(query.strip())[:24]:
-            d = fetch_card_data(nm)
-            if d and d.get("image"):
-                status_text, status_type = check_legality(d["name"], d.get("sets", set()))
-                thumbs.append((d["name"], d["image"], status_text, status_type))
+        with fase("Aba 1 · resolução de cartas"):
+            for nm in buscar_sugestoes(query.strip())[:24]:
+                d = fetch_card_data(nm)
+                if d and d.get("image"):
+                    status_text, status_type = check_legality(d["name"], d.get("sets", set()))
+                    thumbs.append((d["name"], d["image"], status_text, status_type))
 
     if thumbs:
         for i in range(0, len(thumbs), COLS_TAB1):
@@ -383,7 +697,7 @@ with tab1:
 # =====================================================================
 # TAB 2 — Decklist Checker
 # =====================================================================
-with tab2:
+with tab2, fase("Aba 2"):
     st.subheader("📦 Decklist Checker")
     st.write("Cole sua decklist abaixo (1 por linha). Formatos aceitos: `4x Nome`, `4 Nome`, `Nome`.")
     deck_input = st.text_area("Decklist", height=260, key="deck_text_area")
@@ -401,8 +715,8 @@ with tab2:
 
     if deck_input.strip():
         lines = deck_input.splitlines()
-        with ThreadPoolExecutor(max_workers=8) as ex:
-            results = list(ex.map(process_line, lines))
+        with fase("Aba 2 · resolução de cartas"):
+            results = pool_map(process_line, lines)
         results = [r for r in results if r]
         for name, qty, status_text, status_type, _ in results:
             color = {"success": "green", "warning": "orange", "danger": "red"}[status_type]
@@ -420,7 +734,7 @@ with tab2:
 # =====================================================================
 # TAB 3 — Deckbuilder (artes) — 3 colunas fixas + botões centralizados
 # =====================================================================
-with tab3:
+with tab3, fase("Aba 3"):
     st.subheader("🧙‍♂️ Seu Deck — artes por tipo")
     total = sum(st.session_state.deck.values())
     st.markdown(f"**Total de cartas:** {total}")
@@ -448,9 +762,8 @@ with tab3:
             except Exception:
                 return (nm, snap.get(nm, 0), '', None, '', 'warning', [])
 
-        from concurrent.futures import ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=min(8, max(1, len(names)))) as ex:
-            items = list(ex.map(load_one, names))
+        with fase("Aba 3 · resolução de cartas"):
+            items = pool_map(load_one, names)
 
         def bucket(tline: str) -> str:
             tl = tline or ''
@@ -465,8 +778,9 @@ with tab3:
 
         from collections import defaultdict
         buckets = defaultdict(list)
-        for name, qty0, tline, img, s_text, s_type, ci in items:
-            buckets[bucket(tline)].append((name, qty0, tline, img, s_text, s_type, ci))
+        with fase("Aba 3 · agrupamento"):
+            for name, qty0, tline, img, s_text, s_type, ci in items:
+                buckets[bucket(tline)].append((name, qty0, tline, img, s_text, s_type, ci))
 
         order = [
             "Criaturas", "Instantâneas", "Feitiços", "Artefatos",
@@ -474,63 +788,105 @@ with tab3:
         ]
         mana_icons = {'W':'⚪','U':'🔵','B':'⚫','R':'🔴','G':'🟢','C':'⬜️'}
 
-        for sec in order:
-            if sec not in buckets:
+        # Grade paginada: cada seção mostra no máximo `page_size` cartas e o rerun inteiro
+        # respeita TAB3_MAX_TILES (cada carta = 1 card + 2 botões + 4 colunas).
+        page_size = st.selectbox("Cartas por página (por seção)", TAB3_PAGE_SIZES, index=1, key="t3_page_size")
+
+        # Só o que vai virar card (com imagem e qtd > 0) conta para o teto; o cabeçalho soma a seção inteira
+        secs = [sec for sec in order if sec in buckets]
+        tiles = {
+            sec: [it for it in buckets[sec] if it[3] and st.session_state.deck.get(it[0], 0) > 0]
+            for sec in secs
+        }
+
+        # Deck que cabe no teto: tudo aberto. Maior que isso: só a primeira seção abre por padrão.
+        tile_secs = [sec for sec in secs if tiles[sec]]
+        all_fit = sum(len(tiles[sec]) for sec in tile_secs) <= TAB3_MAX_TILES
+        open_default = {sec: all_fit or k == 0 for k, sec in enumerate(tile_secs)}
+        n_open = sum(1 for sec in tile_secs if st.session_state.get(f"t3_open_{sec}", open_default[sec]))
+        # O teto é dividido entre as seções abertas; a página encolhe para caber e o paginador alcança tudo
+        share = max(3, TAB3_MAX_TILES // max(1, n_open) // 3 * 3)
+
+        for sec in secs:
+            st.markdown(f"### {sec} — {sum(q for _, q, _, _, _, _, _ in buckets[sec])}")
+            group = tiles[sec]
+            if len(group) < len(buckets[sec]):
+                st.caption(f"{len(buckets[sec]) - len(group)} cartas sem imagem nesta seção.")
+            if not group:
+                st.markdown("---")
                 continue
-            group = buckets[sec]
-            st.markdown(f"### {sec} — {sum(q for _, q, _, _, _, _, _ in group)}")
-
-            for i in range(0, len(group), 3):  # sempre 3 colunas
-                row = group[i:i+3]
-                cols = st.columns(3)
-                for col, (name, _q0, _t, img, s_text, s_type, ci) in zip(cols, row):
-                    with col:
-                        qty = st.session_state.deck.get(name, 0)
-                        if qty <= 0 or not img:
-                            continue
-
-                        chip_class = "" if s_type == "success" else (
-                            " rf-chip-danger" if s_type == "danger" else " rf-chip-warning"
-                        )
-                        legal_html = (
-                            f"<span class='rf-legal-chip{chip_class}'>" +
-                            ("Banned" if s_type == "danger" else ("Not Legal" if s_type == "warning" else "")) +
-                            "</span>"
-                        ) if s_type != "success" else ""
-                        ci_strip = ''.join(mana_icons.get(c, '') for c in (ci or [])) or mana_icons['C']
-                        overlay = f"<div class='rf-name-badge'><span class='rf-ci'>{ci_strip}</span>{name}{legal_html}</div>"
-
-                        card_ph = st.empty()
-                        card_ph.markdown(
-                            html_card(img, overlay, qty, extra_cls="rf-fixed3", overlimit=(qty > 4)),
-                            unsafe_allow_html=True
-                        )
-
-                        # Botões lado a lado centralizados
-                        empty_left, btns, empty_right = st.columns([1, 2, 1])
-                        with btns:
-                            b1, b2 = st.columns(2)
-                            clicked = False
-                            if b1.button("➖", key=f"m1_{sec}_{i}_{name}"):
-                                remove_card(name, 1)
-                                clicked = True
-                            if b2.button("➕", key=f"p1_{sec}_{i}_{name}"):
-                                add_card(name, 1)
-                                clicked = True
-
-                        if clicked:
-                            qty2 = st.session_state.deck.get(name, 0)
+
+            # Seção recolhida não renderiza nada (nem imagens, nem botões)
+            if not st.toggle("Mostrar", value=open_default[sec], key=f"t3_open_{sec}"):
+                st.markdown("---")
+                continue
+
+            sec_page = min(page_size, share)
+            if sec_page < page_size and len(group) > sec_page:
+                st.caption(f"{sec_page} cartas por página nesta seção (limite de {TAB3_MAX_TILES} por atualização "
+                           f"dividido entre {n_open} seções abertas).")
+            n_pages = max(1, -(-len(group) // sec_page))
+            pg_key = f"t3_pg_{sec}"
+            if st.session_state.get(pg_key, 1) > n_pages:
+                st.session_state[pg_key] = n_pages
+            page = 1
+            if n_pages > 1:
+                page = st.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, step=1, key=pg_key)
+            start = (page - 1) * sec_page
+            visible = group[start:start + sec_page]
+
+            with fase("Aba 3 · HTML da grade"):
+                for i in range(0, len(visible), 3):  # sempre 3 colunas
+                    row = visible[i:i+3]
+                    cols = st.columns(3)
+                    for col, (name, _q0, _t, img, s_text, s_type, ci) in zip(cols, row):
+                        with col:
+                            qty = st.session_state.deck.get(name, 0)
+                            if qty <= 0 or not img:
+                                continue
+
+                            chip_class = "" if s_type == "success" else (
+                                " rf-chip-danger" if s_type == "danger" else " rf-chip-warning"
+                            )
+                            legal_html = (
+                                f"<span class='rf-legal-chip{chip_class}'>" +
+                                ("Banned" if s_type == "danger" else ("Not Legal" if s_type == "warning" else "")) +
+                                "</span>"
+                            ) if s_type != "success" else ""
+                            ci_strip = ''.join(mana_icons.get(c, '') for c in (ci or [])) or mana_icons['C']
+                            overlay = f"<div class='rf-name-badge'><span class='rf-ci'>{ci_strip}</span>{name}{legal_html}</div>"
+
+                            card_ph = st.empty()
                             card_ph.markdown(
-                                html_card(img, overlay, qty2, extra_cls="rf-fixed3", overlimit=(qty2 > 4)),
+                                html_card(img, overlay, qty, extra_cls="rf-fixed3", overlimit=(qty > 4)),
                                 unsafe_allow_html=True
                             )
 
+                            # Botões lado a lado centralizados
+                            empty_left, btns, empty_right = st.columns([1, 2, 1])
+                            with btns:
+                                b1, b2 = st.columns(2)
+                                clicked = False
+                                if b1.button("➖", key=f"m1_{sec}_{start + i}_{name}"):
+                                    remove_card(name, 1)
+                                    clicked = True
+                                if b2.button("➕", key=f"p1_{sec}_{start + i}_{name}"):
+                                    add_card(name, 1)
+                                    clicked = True
+
+                            if clicked:
+                                qty2 = st.session_state.deck.get(name, 0)
+                                card_ph.markdown(
+                                    html_card(img, overlay, qty2, extra_cls="rf-fixed3", overlimit=(qty2 > 4)),
+                                    unsafe_allow_html=True
+                                )
+
             st.markdown("---")
 
 # =====================================================================
 # TAB 4 — Análise (preguiçosa)
 # =====================================================================
-with tab4:
+with tab4, fase("Aba 4"):
     st.subheader("📊 Análise do Deck")
     if not st.session_state.deck:
         st.info("Seu deck está vazio. Adicione cartas nas Abas 1/2/3.")
@@ -555,8 +911,8 @@ with tab4:
                 except Exception:
                     return {'name': nm, 'qty': snap.get(nm,0), 'type_line': '', 'color_identity': [], 'produced_mana': []}
 
-            with ThreadPoolExecutor(max_workers=min(8, max(1, len(names)))) as ex:
-                meta = list(ex.map(load_meta, names))
+            with fase("Aba 4 · resolução de cartas"):
+                meta = pool_map(load_meta, names, prio=PRIO_ANALISE)
             df = pd.DataFrame(meta)
 
             # ===== Subtipos de Criaturas =====
@@ -663,7 +1019,8 @@ with tab4:
             colorless_qty = int(df[df['color_identity'].apply(lambda x: not bool(x))]['qty'].sum())
             dist_vals['C'] += colorless_qty
             dist_df = build_donut_df(dist_vals, val_name='Cópias')
-            st.altair_chart(donut_altair(dist_df, 'Cor', 'Cópias', legend_counts=dist_vals), use_container_width=True)
+            with fase("Aba 4 · gráficos Altair"):
+                st.altair_chart(donut_altair(dist_df, 'Cor', 'Cópias', legend_counts=dist_vals), use_container_width=True)
 
             # ⛲ Fontes de mana
             st.markdown("### ⛲ Fontes de mana por cor")
@@ -693,10 +1050,10 @@ with tab4:
             pie_all = build_donut_df(vals_all, val_name='Fontes')
             pie_land = build_donut_df(vals_land, val_name='Fontes')
             c1, c2 = st.columns(2)
-            with c1:
+            with c1, fase("Aba 4 · gráficos Altair"):
                 st.caption("Todas as permanentes")
                 st.altair_chart(donut_altair(pie_all, 'Cor', 'Fontes', legend_counts=vals_all), use_container_width=True)
-            with c2:
+            with c2, fase("Aba 4 · gráficos Altair"):
                 st.caption("Somente terrenos")
                 st.altair_chart(donut_altair(pie_land, 'Cor', 'Fontes', legend_counts=vals_land), use_container_width=True)
             st.markdown("**Legenda:** ⚪ W 🔵 U ⚫ B 🔴 R 🟢 G ⬜️ C")
@@ -704,36 +1061,76 @@ with tab4:
 # =========================
 # Aba 5 - Banlist com imagens (busca flexível)
 # =========================
-with tab5:
+with tab5, fase("Aba 5"):
     st.subheader("⛔ Cartas Banidas")
 
     if ban_list:
         cols = st.columns(4)
-        for idx, card in enumerate(sorted(ban_list)):
-            clean_name = card.strip()
-
-            import requests
-            from urllib.parse import quote
-            url = f"https://api.scryfall.com/cards/named?fuzzy={quote(clean_name)}"
-            resp = requests.get(url)
-
-            if resp.status_code == 200:
-                data = resp.json()
-                if "image_uris" in data:
-                    img_url = data["image_uris"]["normal"]
-                elif "card_faces" in data:
-                    img_url = data["card_faces"][0]["image_uris"]["normal"]
-                else:
-                    img_url = None
-            else:
-                img_url = None
-
+        # Menor prioridade: só ocupa o pool quando as abas interativas não precisam dele
+        ban_imgs = pool_map(fetch_ban_image, sorted(ban_list), prio=PRIO_PREFETCH)
+        for idx, img_url in enumerate(ban_imgs):
             with cols[idx % 4]:
                 if img_url:
                     st.image(img_url, use_container_width=True)  # <- atualizado
     else:
         st.info("Nenhuma carta banida no momento.")
 
+# =========================
+# Perfil do rerun — tabela na sidebar + histórico + captura
+# =========================
+_perf_total = time.perf_counter() - _perf_t0
+if _profiler is not None:
+    _profiler.stop()
+    st.session_state.pop("perf_profiler", None)
+    from pyinstrument.renderers import SpeedscopeRenderer
+    os.makedirs(PERF_DIR, exist_ok=True)
+    _perf_file = os.path.join(
+        PERF_DIR, f"rerun-{time.strftime('%Y%m%d-%H%M%S')}-{SESSAO[:8]}-{time.time_ns() % 10**9:09d}.speedscope.json"
+    )
+    with open(_perf_file, "w", encoding="utf-8") as fh:
+        fh.write(_profiler.output(SpeedscopeRenderer()))
+    _old = sorted(
+        (os.path.join(PERF_DIR, f) for f in os.listdir(PERF_DIR) if f.endswith(".speedscope.json")),
+        key=os.path.getmtime,
+    )
+    for f in _old[:-PERF_MAX_FILES]:
+        try:
+            os.remove(f)
+        except OSError:
+            pass  # outra sessão já apagou
+    st.session_state.perf_capture_msg = f"Captura salva em `{_perf_file}` (abra em speedscope.app)."
+    st.session_state.perf_last_file = _perf_file
+
+if 'perf_history' not in st.session_state:
+    st.session_state.perf_history = deque(maxlen=PERF_HISTORY)
+st.session_state.perf_history.append(
+    {"quando": time.strftime("%H:%M:%S"), "total (ms)": round(_perf_total * 1000, 1),
+     **{nome: round(v[0] * 1000, 1) for nome, v in _perf_spans.items()}}
+)
+
+with perf_ph.container():
+    rows = [{"fase": ("   " * (v[2] - 1) + "↳ " if v[2] else "") + nome, "ms": round(v[0] * 1000, 1), "chamadas": v[1],
+             "%": round(v[0] / _perf_total * 100, 1) if _perf_total else 0.0}
+            for nome, v in _perf_spans.items()]
+    rows.append({"fase": "TOTAL", "ms": round(_perf_total * 1000, 1), "chamadas": 1, "%": 100.0})
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    st.caption("“nos workers (soma)” soma o tempo de cada tarefa no pool e pode passar de 100%. O flamegraph "
+               "amostra só a thread do script: nele, a resolução de cartas aparece como espera em `Future.result`.")
+    with st.expander(f"Histórico (últimos {len(st.session_state.perf_history)} reruns)"):
+        hist = pd.DataFrame(list(st.session_state.perf_history)).fillna(0.0)
+        st.dataframe(hist.iloc[::-1], hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Histórico CSV", hist.to_csv(index=False).encode("utf-8"),
+                           file_name="perf_history.csv", mime="text/csv")
+
+with perf_files_ph.container():
+    if st.session_state.get("perf_capture_msg"):
+        st.caption(st.session_state.perf_capture_msg)
+    _last_file = st.session_state.get("perf_last_file")
+    if _last_file and os.path.exists(_last_file):
+        with open(_last_file, "rb") as fh:
+            st.download_button("⬇️ Baixar flamegraph (speedscope)", fh.read(),
+                               file_name=os.path.basename(_last_file), mime="application/json")
+
 
 
 
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Romantic Format Tools — harness de carga
+
+Sobe um Scryfall falso local (HTTP, threads) e dispara N sessões simultâneas do `app.py` via
+`streamlit.testing.v1.AppTest` (headless), cada uma fazendo um fluxo realista:
+busca na Aba 1 → cola decklist na Aba 2 → envia ao Deckbuilder → cliques ➕ na Aba 3 → análise da Aba 4.
+
+Relatório por rodada: p50/p95/p99 do tempo de rerun (geral e por passo), taxa de requisições
+ao upstream e se o orçamento de 10 req/s do `throttle()` foi violado (pico numa janela de 1s).
+
+Uso:
+    python loadtest.py --sessions 1,5,10,20
+    python loadtest.py --sessions 8 --latency-ms 80 --deck-size 60
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.parse
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+BUDGET_RPS = 10  # mesmo orçamento do throttle() do app
+
+# ===== Catálogo sintético =====
+_ADJ = ["Ancient", "Blazing", "Crimson", "Dread", "Elder", "Frost", "Gilded", "Hollow", "Iron", "Lightning",
+        "Mystic", "Night", "Oaken", "Primal", "Silent", "Storm", "Thorn", "Vault", "Wild", "Zealous"]
+_NOUN = ["Angel", "Bolt", "Champion", "Drake", "Elemental", "Forge", "Grove", "Helix", "Idol", "Knight",
+         "Lotus", "Mentor", "Oracle", "Pyre", "Rider", "Sphinx", "Titan", "Wall"]
+_TYPES = [
+    "Creature — Elf Warrior", "Creature — Human Wizard", "Creature — Goblin Shaman", "Instant", "Sorcery",
+    "Artifact", "Enchantment — Aura", "Land", "Basic Land — Forest", "Planeswalker — Jace",
+]
+_SETS = ["mrd", "rav", "tsp", "lrw", "ala", "zen", "som", "isd", "m13", "m19", "znr"]
+CATALOG = sorted(f"{a} {n}" for a in _ADJ for n in _NOUN)
+
+
+def _card_json(name: str, base: str, rev: int = 0) -> dict:
+    h = int(hashlib.md5(name.lower().encode()).hexdigest(), 16)
+    tline = _TYPES[h % len(_TYPES)]
+    colors = [c for i, c in enumerate("WUBRG") if (h >> i) & 1][:2]
+    produced = (colors or ["C"]) if "Land" in tline or (h >> 7) % 5 == 0 else None
+    slug = urllib.parse.quote(name.lower().replace(" ", "-"))
+    card = {
+        "object": "card",
+        "id": hashlib.md5(name.encode()).hexdigest(),
+        "name": name,
+        "type_line": tline,
+        "cmc": float(h % 7),
+        "mana_cost": "".join("{" + c + "}" for c in colors) or "{1}",
+        "colors": colors,
+        "color_identity": colors,
+        "image_uris": {"normal": f"{base}/img/{slug}.jpg?v={rev}", "small": f"{base}/img/{slug}-s.jpg?v={rev}"},
+        "prints_search_uri": f"{base}/cards/search?unique=prints&q=" + urllib.parse.quote_plus(f'!"{name}"'),
+        "set": _SETS[h % len(_SETS)],
+    }
+    if produced:
+        card["produced_mana"] = produced
+    return card
+
+
+def _prints(name: str, base: str) -> list:
+    h = int(hashlib.md5(name.lower().encode()).hexdigest(), 16)
+    out = []
+    for k in range(1 + h % 3):
+        c = _card_json(name, base)
+        c["set"] = _SETS[(h >> (3 * k)) % len(_SETS)]
+        out.append(c)
+    return out
+
+
+# ===== Scryfall falso =====
+class FakeScryfall:
+    """Servidor HTTP local que imita os endpoints usados pelo app e registra o instante de cada requisição."""
+
+    def __init__(self, latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.updated_at = "2026-01-01T00:00:00+00:00"  # marcador do bulk-data
+        self.revisions = {}                             # nome -> rev (muda a imagem da carta no upstream)
+        self.issued = {}                                # id -> nome, para cada carta já entregue
+        self.hits = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._record()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                status, body = fake._route(self.path)
+                self._reply(status, body)
+
+            def do_POST(self):
+                fake._record()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                size = int(self.headers.get("Content-Length") or 0)
+                status, body = fake._route_post(self.path, json.loads(self.rfile.read(size) or b"{}"))
+                self._reply(status, body)
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _record(self):
+        with self._lock:
+            self.hits.append(time.monotonic())
+
+    def reset(self):
+        with self._lock:
+            self.hits = []
+
+    def touch(self, *names):
+        """Simula mudança upstream: altera as cartas e avança o marcador do bulk-data."""
+        for n in names:
+            self.revisions[n] = self.revisions.get(n, 0) + 1
+        self.updated_at = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+
+    def _card(self, name: str) -> dict:
+        card = _card_json(name, self.base, self.revisions.get(name, 0))
+        with self._lock:
+            self.issued[card["id"]] = name
+        return card
+
+    def _route(self, path: str):
+        u = urllib.parse.urlsplit(path)
+        qs = urllib.parse.parse_qs(u.query)
+        q = (qs.get("q") or qs.get("fuzzy") or [""])[0]
+        if u.path == "/cards/autocomplete":
+            ql = q.lower()
+            return 200, {"object": "catalog", "data": [n for n in CATALOG if n.lower().startswith(ql)][:20]}
+        if u.path == "/cards/named":
+            if not q.strip():
+                return 404, {"object": "error", "status": 404}
+            return 200, self._card(q.strip())
+        if u.path == "/cards/search":
+            name = q.split('"')[1] if q.count('"') >= 2 else q
+            data = _prints(name, self.base)
+            return 200, {"object": "list", "total_cards": len(data), "has_more": False, "data": data}
+        if u.path == "/bulk-data/oracle-cards":
+            return 200, {"object": "bulk_data", "type": "oracle_cards", "updated_at": self.updated_at}
+        return 404, {"object": "error", "status": 404}
+
+    def _route_post(self, path: str, body: dict):
+        if urllib.parse.urlsplit(path).path != "/cards/collection":
+            return 404, {"object": "error", "status": 404}
+        with self._lock:
+            by_id = dict(self.issued)
+        data, missing = [], []
+        for ident in body.get("identifiers", [])[:75]:
+            name = by_id.get(ident.get("id")) or ident.get("name")
+            if name:
+                data.append(self._card(name))
+            else:
+                missing.append(ident)
+        return 200, {"object": "list", "not_found": missing, "data": data}
+
+    def stats(self, t0: float, t1: float) -> dict:
+        with self._lock:
+            hits = sorted(h for h in self.hits if t0 <= h <= t1)
+        # pico de requisições em qualquer janela deslizante (h-1s, h]
+        peak = 0
+        for i, h in enumerate(hits):
+            peak = max(peak, i - bisect_right(hits, h - 1.0) + 1)
+        dur = max(t1 - t0, 1e-9)
+        return {"requests": len(hits), "rps_mean": len(hits) / dur, "rps_peak_1s": peak,
+                "budget_violated": peak > BUDGET_RPS}
+
+
+# ===== Fluxo de uma sessão =====
+def _pct(values, p):
+    if not values:
+        return 0.0
+    v = sorted(values)
+    k = max(0, min(len(v) - 1, math.ceil(p / 100.0 * len(v)) - 1))
+    return v[k]
+
+
+def run_session(idx: int, args, timings: dict, errors: list):
+    from streamlit.testing.v1 import AppTest
+
+    rnd = random.Random(args.seed + idx)
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+
+    def step(label, action):
+        t = time.perf_counter()
+        action()
+        timings[label].append(time.perf_counter() - t)
+        if at.exception:
+            errors.append((idx, label, at.exception[0].message))
+
+    step("inicial", at.run)
+
+    # Aba 1 — busca por prefixo
+    prefix = rnd.choice(_ADJ)[:rnd.randint(2, 4)]
+    step("aba1_busca", lambda: at.text_input[0].input(prefix).run())
+
+    # Aba 2 — cola decklist
+    picks = rnd.sample(CATALOG, args.deck_size)
+    deck_text = "\n".join(f"{rnd.randint(1, 4)}x {n}" for n in picks)
+    step("aba2_lista", lambda: at.text_area(key="deck_text_area").input(deck_text).run())
+    send = [b for b in at.button if b.label.startswith("📥")]
+    if send:
+        step("aba2_enviar", lambda: send[0].click().run())
+
+    # Aba 3 — cliques ➕/➖
+    for _ in range(args.clicks):
+        plus = [b for b in at.button if (b.key or "").startswith(("p1_", "m1_"))]
+        if not plus:
+            break
+        b = rnd.choice(plus)
+        step("aba3_clique", lambda: b.click().run())
+
+    # Aba 4 — análise
+    tog = [t for t in at.toggle if t.label.startswith("Calcular análise")]
+    if tog:
+        step("aba4_analise", lambda: tog[0].set_value(True).run())
+
+
+def run_round(n: int, args, fake: FakeScryfall) -> dict:
+    import streamlit as st
+
+    if not args.warm:
+        st.cache_data.clear()
+    fake.reset()
+    timings, errors = defaultdict(list), []
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        futs = [ex.submit(run_session, i, args, timings, errors) for i in range(n)]
+        for f in futs:
+            try:
+                f.result()
+            except Exception as e:  # sessão inteira falhou (timeout do AppTest etc.)
+                errors.append((-1, "sessao", repr(e)))
+    t1 = time.monotonic()
+    return {"sessions": n, "wall_s": t1 - t0, "timings": dict(timings), "errors": errors,
+            "upstream": fake.stats(t0, t1)}
+
+
+def print_report(r: dict):
+    up = r["upstream"]
+    all_t = [x for v in r["timings"].values() for x in v]
+    print(f"\n=== {r['sessions']} sessões — {r['wall_s']:.1f}s ===")
+    print(f"{'passo':<14}{'n':>5}{'p50':>9}{'p95':>9}{'p99':>9}  (s)")
+    for label, vals in list(r["timings"].items()) + [("TOTAL", all_t)]:
+        print(f"{label:<14}{len(vals):>5}{_pct(vals, 50):>9.3f}{_pct(vals, 95):>9.3f}{_pct(vals, 99):>9.3f}")
+    flag = "VIOLADO" if up["budget_violated"] else "ok"
+    print(f"upstream: {up['requests']} req, média {up['rps_mean']:.1f} req/s, "
+          f"pico {up['rps_peak_1s']} req/1s — orçamento {BUDGET_RPS} req/s: {flag}")
+    if r["errors"]:
+        print(f"erros: {len(r['errors'])} (ex.: {r['errors'][0]})")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Teste de carga headless do Romantic Format Tools.")
+    ap.add_argument("--sessions", default="1,4,8", help="lista de concorrências, ex.: 1,5,10,20")
+    ap.add_argument("--deck-size", type=int, default=30, help="cartas distintas na decklist colada")
+    ap.add_argument("--clicks", type=int, default=5, help="cliques na Aba 3 por sessão")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="latência simulada do upstream")
+    ap.add_argument("--timeout", type=float, default=120.0, help="timeout de cada rerun (s)")
+    ap.add_argument("--warm", action="store_true", help="não limpa o cache de cartas entre rodadas")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--json", help="salva os resultados brutos neste arquivo")
+    args = ap.parse_args(argv)
+
+    results = []
+    with FakeScryfall(latency_ms=args.latency_ms) as fake:
+        os.environ["SCRYFALL_API"] = fake.base
+        for n in (int(x) for x in args.sessions.split(",") if x.strip()):
+            r = run_round(n, args, fake)
+            print_report(r)
+            results.append(r)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()